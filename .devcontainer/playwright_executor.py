@@ -3,29 +3,161 @@ from playwright.async_api import async_playwright
 import argparse
 from datetime import datetime
 import os
+import sys
 import json
 from pathlib import Path
-import tempfile
 import base64
+import hashlib
+import itertools
+import uuid
+from collections import OrderedDict
 
-async def execute_playwright_script(url: str, script: str, output_dir: str = ".screenshots", capture_logs: bool = False):
+# Compiled script code objects keyed by the sha256 of the script source, least recently used first
+_compiled_scripts = OrderedDict()
+_COMPILED_SCRIPTS_MAX = 256
+
+
+def compile_script(script: str):
     """
-    Executes a Playwright script and captures outputs.
+    Wraps a script body in `run_test(page, output_dir)` and compiles it once per unique source.
+
+    Returns the wrapped source and its code object; use `load_run_test` to get a fresh
+    `run_test` per job so scripts that use globals don't share state across runs.
     """
-    # Create output directory
-    
+    # Decode script if base64 encoded
+    if script.startswith('base64:'):
+        script = base64.b64decode(script[7:]).decode('utf-8')
+
+    script_hash = hashlib.sha256(script.encode('utf-8')).hexdigest()
+    if script_hash in _compiled_scripts:
+        _compiled_scripts.move_to_end(script_hash)
+        return _compiled_scripts[script_hash]
+
+    # Add proper indentation to the script
+    indented_script = ""
+    for line in script.split('\n'):
+        if line.strip():
+            indented_script += "    " + line + "\n"
+        else:
+            indented_script += "\n"
+
+    # Create test script with proper indentation
+    test_script = f"""async def run_test(page, output_dir):
+{indented_script}"""
+
+    code = compile(test_script, f"<playwright_script_{script_hash[:12]}>", "exec")
+
+    compiled = (test_script, code)
+    _compiled_scripts[script_hash] = compiled
+    if len(_compiled_scripts) > _COMPILED_SCRIPTS_MAX:
+        _compiled_scripts.popitem(last=False)
+    return compiled
+
+
+def load_run_test(code):
+    """
+    Executes a compiled script into fresh globals and returns its `run_test` coroutine function.
+    """
+    namespace = {}
+    exec(code, namespace)
+    return namespace["run_test"]
+
+
+class BrowserPool:
+    """
+    Keeps a set of warm Chromium instances and hands out an isolated context per job.
+
+    The shared `<output_dir>/screenshot.jpeg` is only updated when jobs run one at a time;
+    with concurrency > 1 each job's screenshots are only written to its own run dir.
+    """
+
+    def __init__(self, size: int = 1, concurrency: int = 4):
+        self.size = max(1, size)
+        self.concurrency = max(1, concurrency)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self._playwright = None
+        self._browsers = []
+        self._next_index = None
+        self._relaunch_lock = asyncio.Lock()
+
+    async def start(self):
+        try:
+            self._playwright = await async_playwright().start()
+            launches = await asyncio.gather(
+                *(self._playwright.chromium.launch(headless=True) for _ in range(self.size)),
+                return_exceptions=True
+            )
+            self._browsers = [browser for browser in launches if not isinstance(browser, BaseException)]
+            for launch in launches:
+                if isinstance(launch, BaseException):
+                    raise launch
+        except BaseException:
+            # __aexit__ doesn't run when __aenter__ fails, so don't leak what did start
+            await self.close()
+            raise
+        self._next_index = itertools.cycle(range(self.size))
+        return self
+
+    async def _acquire_browser(self):
+        """
+        Returns the next browser, relaunching it first if it crashed or disconnected.
+        """
+        index = next(self._next_index)
+        if self._browsers[index].is_connected():
+            return self._browsers[index]
+
+        async with self._relaunch_lock:
+            # Another job may have relaunched it while we waited
+            if not self._browsers[index].is_connected():
+                self._browsers[index] = await self._playwright.chromium.launch(headless=True)
+            return self._browsers[index]
+
+    async def close(self):
+        await asyncio.gather(*(browser.close() for browser in self._browsers), return_exceptions=True)
+        self._browsers = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def run(self, url: str, script: str, output_dir: str = ".screenshots", capture_logs: bool = False,
+                  wait_until: str = "networkidle"):
+        """
+        Runs one job in a fresh context on the next browser, waiting for a free concurrency slot first.
+
+        The script is compiled before taking a slot, so scripts that don't compile fail immediately.
+        """
+        try:
+            test_script, code = compile_script(script)
+        except Exception as e:
+            return _error_result(f"Script error: {str(e)}")
+
+        async with self.semaphore:
+            browser = await self._acquire_browser()
+            return await _run_in_browser(browser, url, test_script, code, output_dir, capture_logs, wait_until,
+                                         update_latest_screenshot=self.concurrency == 1)
+
+
+async def _run_in_browser(browser, url: str, test_script: str, code, output_dir: str, capture_logs: bool, wait_until: str,
+                          update_latest_screenshot: bool = True):
     automation_output_dir = 'automation_output'
 
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(automation_output_dir, exist_ok=True)
 
+    # Concurrent jobs can start within the same second, so suffix the run dir
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    run_dir = Path(automation_output_dir) / timestamp
+    run_dir = Path(automation_output_dir) / f"{timestamp}_{uuid.uuid4().hex[:8]}"
     run_dir.mkdir(exist_ok=True)
 
     screenshot_dir = Path(output_dir)
     screenshot_dir.mkdir(exist_ok=True)
-    
+
     result = {
         "status": "success",
         "data": {
@@ -37,135 +169,262 @@ async def execute_playwright_script(url: str, script: str, output_dir: str = ".s
     }
 
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await context.new_page()
-            
-            # Store console logs if requested
-            console_logs = []
-            if capture_logs:
-                page.on("console", lambda msg: console_logs.append(f"{msg.type}: {msg.text}"))
-            
-            try:
-                # Navigate to URL first
-                await page.goto(url, wait_until="networkidle", timeout=30000)
-                
-                # Decode script if base64 encoded
-                if script.startswith('base64:'):
-                    script = base64.b64decode(script[7:]).decode('utf-8')
-                
-                # Add proper indentation to the script
-                indented_script = ""
-                for line in script.split('\n'):
-                    if line.strip():
-                        indented_script += "    " + line + "\n"
-                    else:
-                        indented_script += "\n"
-                
-                # Create test script with proper indentation
-                test_script = f"""async def run_test(page, output_dir):
-{indented_script}"""
+        context = await browser.new_context()
+    except Exception as e:
+        result["status"] = "error"
+        result["data"]["error"] = f"Setup error: {str(e)}"
+        return result
 
-                # Write the test script to a file for debugging
-                test_script_path = run_dir / "test_script.py"
-                with open(test_script_path, "w") as f:
-                    f.write(test_script)
-
-                # Save script to temp file for execution
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                    f.write(test_script)
-                    script_path = f.name
-
-                # Import and execute the script
-                import importlib.util
-                spec = importlib.util.spec_from_file_location("dynamic_script", script_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                
-                # Run the test
-                output = await module.run_test(page, str(run_dir))
-                if output is not None:
-                    result["data"]["output"] = output
-                
-                # Take a screenshot if none were taken
-                screenshot_files = list(run_dir.glob('*.{png,jpg,jpeg}'))
-                if not screenshot_files:
-                    final_screenshot = run_dir / f"final_{timestamp}.png"
-                    await page.screenshot(
-                        path=str(final_screenshot),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                    result["data"]["screenshots"].append(str(final_screenshot))
+    try:
+        page = await context.new_page()
 
-                    # Save additional screenshot to .screenshot folder
-                    await page.screenshot(
-                        path=str(screenshot_dir / "screenshot.jpeg"),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                else:
-                    result["data"]["screenshots"].extend(str(f) for f in screenshot_files)
-
-                # Save console logs if captured
-                if capture_logs and console_logs:
-                    log_path = run_dir / f"console_{timestamp}.log"
-                    with open(log_path, "w", encoding="utf-8") as f:
-                        f.write("\n".join(console_logs))
-                    result["data"]["console_logs"].append(str(log_path))
-
-            except Exception as e:
-                result["status"] = "error"
-                result["data"]["error"] = f"Script error: {str(e)}"
-                error_screenshot = run_dir / f"error_{timestamp}.png"
+        # Store console logs if requested
+        console_logs = []
+        if capture_logs:
+            page.on("console", lambda msg: console_logs.append(f"{msg.type}: {msg.text}"))
+
+        try:
+            # Navigate to URL first
+            await page.goto(url, wait_until=wait_until, timeout=30000)
+
+            run_test = load_run_test(code)
+
+            # Write the test script to a file for debugging
+            test_script_path = run_dir / "test_script.py"
+            with open(test_script_path, "w") as f:
+                f.write(test_script)
+
+            # Run the test
+            output = await run_test(page, str(run_dir))
+            if output is not None:
+                result["data"]["output"] = output
+
+            # Always take a final screenshot, even if the script saved its own
+            final_screenshot = run_dir / f"final_{timestamp}.png"
+            await page.screenshot(
+                path=str(final_screenshot),
+                full_page=True,
+                type="jpeg",
+                quality = 50
+            )
+            result["data"]["screenshots"].append(str(final_screenshot))
+
+            # Save additional screenshot to .screenshot folder
+            if update_latest_screenshot:
                 await page.screenshot(
-                        path=str(error_screenshot),
-                        full_page=True,
-                        type="jpeg",
-                        quality = 50
-                    )
-                result["data"]["screenshots"].append(str(error_screenshot))
+                    path=str(screenshot_dir / "screenshot.jpeg"),
+                    full_page=True,
+                    type="jpeg",
+                    quality = 50
+                )
+
+            # Save console logs if captured
+            if capture_logs and console_logs:
+                log_path = run_dir / f"console_{timestamp}.log"
+                with open(log_path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(console_logs))
+                result["data"]["console_logs"].append(str(log_path))
 
-                # Save additional screenshot to .screenshot folder
+        except Exception as e:
+            result["status"] = "error"
+            result["data"]["error"] = f"Script error: {str(e)}"
+            error_screenshot = run_dir / f"error_{timestamp}.png"
+            await page.screenshot(
+                    path=str(error_screenshot),
+                    full_page=True,
+                    type="jpeg",
+                    quality = 50
+                )
+            result["data"]["screenshots"].append(str(error_screenshot))
+
+            # Save additional screenshot to .screenshot folder
+            if update_latest_screenshot:
                 await page.screenshot(
                         path=str(screenshot_dir / "screenshot.jpeg"),
                         full_page=True,
                         type="jpeg",
                         quality = 50
                     )
-            
-            finally:
-                if os.path.exists(script_path):
-                    os.unlink(script_path)
-                await browser.close()
 
     except Exception as e:
         result["status"] = "error"
         result["data"]["error"] = f"Setup error: {str(e)}"
 
+    finally:
+        await context.close()
+
+    return result
+
+
+async def execute_playwright_script(url: str, script: str, output_dir: str = ".screenshots", capture_logs: bool = False,
+                                    wait_until: str = "networkidle", pool: BrowserPool = None):
+    """
+    Executes a Playwright script and captures outputs.
+
+    Reuses `pool` when given; otherwise launches a single browser for this call.
+    """
+    if pool is not None:
+        return await pool.run(url, script, output_dir, capture_logs, wait_until)
+
+    try:
+        async with BrowserPool(size=1, concurrency=1) as one_off_pool:
+            return await one_off_pool.run(url, script, output_dir, capture_logs, wait_until)
+    except Exception as e:
+        return _error_result(f"Setup error: {str(e)}")
+
+
+def _error_result(message: str, job_id=None):
+    result = {
+        "status": "error",
+        "data": {
+            "screenshots": [],
+            "console_logs": [],
+            "error": message,
+            "output": None
+        }
+    }
+    if job_id is not None:
+        result["id"] = job_id
+    return result
+
+
+def _job_error(job):
+    """
+    Returns why `job` can't be run, or None if it is a valid {"url", "script", ...} object.
+    """
+    if not isinstance(job, dict):
+        return "Invalid job: expected a JSON object"
+    missing = [key for key in ("url", "script") if not isinstance(job.get(key), str) or not job.get(key)]
+    if missing:
+        return f"Invalid job: missing {', '.join(missing)}"
+    return None
+
+
+async def _run_job(pool: BrowserPool, job, output_dir: str, capture_logs: bool, wait_until: str):
+    """
+    Runs one job on `pool`, turning invalid jobs and unexpected failures into error results.
+    """
+    job_id = job.get("id") if isinstance(job, dict) else None
+
+    error = _job_error(job)
+    if error:
+        return _error_result(error, job_id)
+
+    try:
+        result = await pool.run(
+            job["url"],
+            job["script"],
+            job.get("output", output_dir),
+            job.get("capture_logs", capture_logs),
+            job.get("wait_until", wait_until)
+        )
+    except Exception as e:
+        return _error_result(f"Setup error: {str(e)}", job_id)
+
+    if job_id is not None:
+        result["id"] = job_id
     return result
 
+
+async def execute_playwright_scripts(jobs, pool_size: int = 1, concurrency: int = 4, output_dir: str = ".screenshots",
+                                     capture_logs: bool = False, wait_until: str = "networkidle"):
+    """
+    Executes many jobs ({"url", "script", ...}) on a shared browser pool, returning results in job order.
+    """
+    if not isinstance(jobs, list):
+        return [_error_result("Invalid jobs: expected a JSON list")]
+
+    try:
+        async with BrowserPool(size=pool_size, concurrency=concurrency) as pool:
+            return await asyncio.gather(*(
+                _run_job(pool, job, output_dir, capture_logs, wait_until) for job in jobs
+            ))
+    except Exception as e:
+        return [_error_result(f"Setup error: {str(e)}", job.get("id") if isinstance(job, dict) else None) for job in jobs]
+
+
+async def serve(pool_size: int = 1, concurrency: int = 4, output_dir: str = ".screenshots",
+                capture_logs: bool = False, wait_until: str = "networkidle"):
+    """
+    Persistent mode: reads one JSON job per stdin line and prints one JSON result per line as jobs finish.
+
+    Each result echoes the job's "id" (when given) so callers can match out-of-order completions.
+    """
+    loop = asyncio.get_running_loop()
+    pending = set()
+
+    async def handle(job):
+        result = await _run_job(pool, job, output_dir, capture_logs, wait_until)
+        print(json.dumps(result), flush=True)
+
+    async with BrowserPool(size=pool_size, concurrency=concurrency) as pool:
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(json.dumps(_error_result(f"Invalid job: {str(e)}")), flush=True)
+                continue
+            task = asyncio.create_task(handle(job))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Execute Playwright automation script")
-    parser.add_argument("url", help="URL to automate")
-    parser.add_argument("--script", required=True, help="Playwright script to execute (plain text or base64 encoded with 'base64:' prefix)")
+    parser.add_argument("url", nargs="?", help="URL to automate")
+    parser.add_argument("--script", help="Playwright script to execute (plain text or base64 encoded with 'base64:' prefix)")
     parser.add_argument("--output", "-o", default=".screenshots",
                         help="Output directory for screenshots and logs")
     parser.add_argument("--capture-logs", action="store_true", help="Capture console logs")
-    
+    parser.add_argument("--wait-until", default="networkidle",
+                        choices=["load", "domcontentloaded", "networkidle", "commit"],
+                        help="Navigation event to wait for before running the script")
+    parser.add_argument("--jobs", help="JSON file with a list of {\"url\", \"script\"} jobs to run on a shared browser pool")
+    parser.add_argument("--serve", action="store_true",
+                        help="Keep the browser pool warm and run JSON jobs read line by line from stdin")
+    parser.add_argument("--pool-size", type=int, default=1, help="Number of browsers kept in the pool")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of jobs running at once (above 1, <output>/screenshot.jpeg is not updated)")
+
     args = parser.parse_args()
-    
+
+    if args.serve:
+        asyncio.run(serve(args.pool_size, args.concurrency, args.output, args.capture_logs, args.wait_until))
+        return
+
+    if args.jobs:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            jobs = json.load(f)
+        results = asyncio.run(execute_playwright_scripts(
+            jobs,
+            args.pool_size,
+            args.concurrency,
+            args.output,
+            args.capture_logs,
+            args.wait_until
+        ))
+        print(json.dumps(results))
+        return
+
+    if not args.url or not args.script:
+        parser.error("url and --script are required unless --jobs or --serve is given")
+
     result = asyncio.run(execute_playwright_script(
         args.url,
         args.script,
         args.output,
-        args.capture_logs
+        args.capture_logs,
+        args.wait_until
     ))
-    
+
     print(json.dumps(result))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, ExecutionTimeout, WriteConcernError
+import bson
 import os
+import sys
+import math
+import time
+import threading
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Dict, Any, Optional, Tuple
+from collections import Counter
+import asyncio
 import uuid
 from datetime import datetime
 
@@ -14,9 +25,96 @@ from datetime import datetime
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+
+# Metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class MetricsRegistry:
+    """
+    Minimal in-process histograms rendered in the Prometheus text format.
+
+    Thread-safe, since Mongo command events are reported from motor's worker threads.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, Tuple], list] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # [per-bucket counts..., sum, count]
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @staticmethod
+    def _labels(labels: Tuple, extra: Tuple = ()) -> str:
+        pairs = labels + extra
+        if not pairs:
+            return ''
+        escaped = (
+            (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in pairs
+        )
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = sorted((key, list(value)) for key, value in self._histograms.items())
+
+        lines = []
+        seen = set()
+
+        def header(name: str):
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+            lines.append(f'# TYPE {name} histogram')
+
+        for (name, labels), histogram in histograms:
+            header(name)
+            for i, bound in enumerate(self.buckets):
+                lines.append(f'{name}_bucket{self._labels(labels, (("le", bound),))} {histogram[i]}')
+            lines.append(f'{name}_bucket{self._labels(labels, (("le", "+Inf"),))} {histogram[-1]}')
+            lines.append(f'{name}_sum{self._labels(labels)} {histogram[-2]}')
+            lines.append(f'{name}_count{self._labels(labels)} {histogram[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('http_request_duration_seconds', 'API request latency by route.')
+metrics.describe('mongo_command_duration_seconds', 'MongoDB command latency reported by command monitoring.')
+metrics.describe('outbound_request_duration_seconds',
+                 'Latency of Gemini and GitHub calls, timed in the browser and reported via /api/events.')
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.observe('mongo_command_duration_seconds', event.duration_micros / 1e6,
+                        command=event.command_name, status='ok')
+
+    def failed(self, event):
+        metrics.observe('mongo_command_duration_seconds', event.duration_micros / 1e6,
+                        command=event.command_name, status='error')
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -35,6 +133,247 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class AnalyticsEvent(BaseModel):
+    event: str
+    properties: Dict[str, Any] = Field(default_factory=dict)
+    distinct_id: Optional[str] = None
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class AnalyticsEventBatch(BaseModel):
+    events: List[AnalyticsEvent] = Field(..., max_length=1000)
+
+
+# Batched analytics ingestion
+EVENT_FLUSH_SIZE = int(os.environ.get('EVENT_FLUSH_SIZE', 500))
+EVENT_FLUSH_INTERVAL = float(os.environ.get('EVENT_FLUSH_INTERVAL', 5))
+EVENT_BUFFER_LIMIT = int(os.environ.get('EVENT_BUFFER_LIMIT', 10000))
+DUPLICATE_KEY_ERROR = 11000
+MAX_EVENT_BYTES = 16 * 1024
+# Errors worth retrying; anything else would fail the same way on every flush
+TRANSIENT_MONGO_ERRORS = (ConnectionFailure, ExecutionTimeout, WriteConcernError)
+
+# Counter field names come from client-supplied values, so only known values become fields
+COUNTED_EVENTS = {
+    'candidate_analyzed',
+    'resume_uploaded',
+    'talent_search_performed',
+    'interview_questions_generated',
+    'candidate_contacted',
+    'feature_used',
+    'outbound_call',
+}
+CANDIDATE_MODES = {'internal', 'external'}
+SCORE_CATEGORIES = {'high', 'medium', 'low'}
+
+class EventBuffer:
+    """
+    Buffers analytics events in memory and writes them to Mongo with one insert_many per flush.
+
+    Counters (candidates analyzed, red flags, ...) are pre-aggregated per flush and applied
+    to per-day documents with one bulk_write, so dashboards never scan raw events. On transient
+    Mongo errors, events and counters go back into the buffer (up to `max_buffered` events) and
+    are retried on the next flush; documents Mongo rejects are logged and dropped.
+    """
+
+    def __init__(self, max_size: int = EVENT_FLUSH_SIZE, flush_interval: float = EVENT_FLUSH_INTERVAL,
+                 max_buffered: int = EVENT_BUFFER_LIMIT):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._events: List[dict] = []
+        self._counters: Counter = Counter()
+        self._lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._flush_tasks = set()
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def add(self, events: List[AnalyticsEvent]) -> int:
+        """Buffers the events Mongo can store and returns how many were accepted."""
+        accepted = 0
+        async with self._lock:
+            for event in events:
+                document = event.dict()
+                try:
+                    size = len(bson.encode(document))
+                except Exception:
+                    continue
+                if size > MAX_EVENT_BYTES:
+                    continue
+                self._events.append(document)
+                self._count(event)
+                accepted += 1
+            self._drop_overflow()
+            should_flush = len(self._events) >= self.max_size
+        # Flush in the background so the request that fills the buffer doesn't wait on Mongo;
+        # a flush already in progress picks these up next time round
+        if should_flush and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        return accepted
+
+    def _drop_overflow(self):
+        overflow = len(self._events) - self.max_buffered
+        if overflow > 0:
+            del self._events[:overflow]
+            logger.warning("Analytics event buffer full, dropped %d oldest events", overflow)
+
+    def _count(self, event: AnalyticsEvent):
+        props = event.properties
+        day = event.timestamp.strftime('%Y-%m-%d')
+        name = event.event if event.event in COUNTED_EVENTS else 'other'
+        self._counters[(day, f'events.{name}')] += 1
+        if event.event == 'candidate_analyzed':
+            self._counters[(day, 'candidates_analyzed')] += 1
+            if props.get('mode') in CANDIDATE_MODES:
+                self._counters[(day, f'candidates_by_mode.{props["mode"]}')] += 1
+            if props.get('score_category') in SCORE_CATEGORIES:
+                self._counters[(day, f'score_distribution.{props["score_category"]}')] += 1
+            red_flags = props.get('red_flags_count') or 0
+            if isinstance(red_flags, (int, float)) and not isinstance(red_flags, bool) and red_flags > 0:
+                self._counters[(day, 'red_flags_total')] += int(red_flags)
+                self._counters[(day, 'candidates_with_red_flags')] += 1
+
+    async def _requeue(self, events: List[dict], counters: Counter):
+        async with self._lock:
+            self._events = events + self._events
+            self._drop_overflow()
+            self._counters.update(counters)
+
+    async def _insert_events(self, events: List[dict]) -> List[dict]:
+        """Inserts events and returns the ones to retry after a transient failure."""
+        try:
+            await db.analytics_events.insert_many(events, ordered=False)
+        except BulkWriteError as e:
+            details = e.details or {}
+            # Requeued events keep the _id from their first attempt, so duplicate key
+            # errors only mean that part of the batch was already stored
+            rejected = [error for error in details.get('writeErrors', []) if error.get('code') != DUPLICATE_KEY_ERROR]
+            if rejected:
+                logger.error("Dropped %d analytics events rejected by Mongo: %s",
+                             len(rejected), rejected[0].get('errmsg'))
+            if details.get('writeConcernErrors'):
+                logger.warning("Write concern error inserting analytics events, will retry")
+                rejected_indexes = {error['index'] for error in rejected}
+                return [event for i, event in enumerate(events) if i not in rejected_indexes]
+        except TRANSIENT_MONGO_ERRORS:
+            logger.warning("Failed to insert %d analytics events, will retry", len(events), exc_info=True)
+            return events
+        except Exception:
+            # e.g. a document that can't be encoded: insert one by one so only that one is lost
+            logger.exception("Failed to insert %d analytics events as a batch", len(events))
+            return await self._insert_individually(events)
+        return []
+
+    async def _insert_individually(self, events: List[dict]) -> List[dict]:
+        for i, event in enumerate(events):
+            try:
+                await db.analytics_events.insert_one(event)
+            except DuplicateKeyError:
+                pass
+            except TRANSIENT_MONGO_ERRORS:
+                logger.warning("Failed to insert analytics events, will retry", exc_info=True)
+                return events[i:]
+            except Exception:
+                logger.exception("Dropped analytics event that could not be inserted")
+        return []
+
+    async def _apply_counters(self, counters: Counter) -> Counter:
+        """Applies counters with one upsert per day and returns the ones to retry."""
+        by_day: Dict[str, Dict[str, int]] = {}
+        for (day, key), value in counters.items():
+            by_day.setdefault(day, {})[key] = value
+        days = list(by_day)
+
+        try:
+            await db.analytics_counters.bulk_write(
+                [UpdateOne({'_id': day}, {'$inc': by_day[day]}, upsert=True) for day in days],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            details = e.details or {}
+            if details.get('writeConcernErrors'):
+                logger.warning("Write concern error updating analytics counters, will retry")
+                return counters
+            # Concurrent upserts of a new day can race on _id; those succeed on retry
+            retry_days = set()
+            for error in details.get('writeErrors', []):
+                day = days[error['index']]
+                if error.get('code') == DUPLICATE_KEY_ERROR:
+                    retry_days.add(day)
+                else:
+                    logger.error("Dropped analytics counters for %s: %s", day, error.get('errmsg'))
+            return Counter({key: value for key, value in counters.items() if key[0] in retry_days})
+        except TRANSIENT_MONGO_ERRORS:
+            logger.warning("Failed to update analytics counters, will retry", exc_info=True)
+            return counters
+        except Exception:
+            logger.exception("Dropped analytics counters that could not be written")
+        return Counter()
+
+    async def flush(self):
+        # Serialised so periodic, size-triggered and shutdown flushes never overlap
+        async with self._flush_lock:
+            async with self._lock:
+                events, self._events = self._events, []
+                counters, self._counters = self._counters, Counter()
+
+            if events:
+                retry = await self._insert_events(events)
+                if retry:
+                    await self._requeue(retry, counters)
+                    return
+
+            if counters:
+                retry = await self._apply_counters(counters)
+                if retry:
+                    await self._requeue([], retry)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let in-progress flushes finish rather than cancelling them mid-write
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks)
+        await self.flush()
+
+event_buffer = EventBuffer()
+
+# The LLM and GitHub calls run in the browser, which reports their timings as outbound_call events
+OUTBOUND_SERVICES = {'gemini', 'github'}
+OUTBOUND_MAX_SECONDS = 600
+
+def observe_outbound_calls(events: List[AnalyticsEvent]):
+    for event in events:
+        if event.event != 'outbound_call':
+            continue
+        props = event.properties
+        service = props.get('service')
+        duration_ms = props.get('duration_ms')
+        if service not in OUTBOUND_SERVICES or isinstance(duration_ms, bool) \
+                or not isinstance(duration_ms, (int, float)) or not math.isfinite(duration_ms):
+            continue
+        seconds = duration_ms / 1000
+        if not 0 <= seconds <= OUTBOUND_MAX_SECONDS:
+            continue
+        metrics.observe('outbound_request_duration_seconds', seconds,
+                        service=service, status='error' if props.get('status') == 'error' else 'ok')
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -52,9 +391,90 @@ async def get_status_checks():
     status_checks = await db.status_checks.find().to_list(1000)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.post("/events", status_code=202)
+async def ingest_events(request: Request):
+    # Parsed by hand so the browser's pagehide sendBeacon, which can only send
+    # CORS-safelisted types like text/plain, is accepted alongside application/json
+    try:
+        batch = AnalyticsEventBatch.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    observe_outbound_calls(batch.events)
+    accepted = await event_buffer.add(batch.events)
+    return {"accepted": accepted, "rejected": len(batch.events) - accepted}
+
+@api_router.get("/events/counters")
+async def get_event_counters(days: int = Query(30, ge=1, le=365)):
+    counters = await db.analytics_counters.find().sort('_id', -1).to_list(days)
+    return [{"date": doc.pop('_id'), **doc} for doc in counters]
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+# Sampling profiler, opt-in since stack dumps expose code paths
+ENABLE_PROFILER = os.environ.get('ENABLE_PROFILER', '').lower() in ('1', 'true', 'yes')
+PROFILER_MAX_SECONDS = 60
+PROFILER_MIN_INTERVAL = 0.001
+profiler_lock = asyncio.Lock()
+
+def sample_stacks(seconds: float, interval: float) -> str:
+    """
+    Samples every thread's stack and returns collapsed stacks (`frame;frame;frame count`),
+    the input format of flamegraph.pl and speedscope.
+    """
+    sampler_id = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_id:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f'{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})')
+                frame = frame.f_back
+            stacks[';'.join(reversed(frames))] += 1
+        time.sleep(interval)
+    return '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common()) + '\n'
+
+@api_router.get("/debug/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = 5, interval: float = 0.005):
+    if not ENABLE_PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler is disabled; set ENABLE_PROFILER=true")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or not PROFILER_MIN_INTERVAL <= interval <= seconds:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be in (0, {PROFILER_MAX_SECONDS}] and interval in [{PROFILER_MIN_INTERVAL}, seconds]",
+        )
+    # One profile at a time: each run holds an executor thread and samples every thread's stack
+    if profiler_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profiler_lock:
+        loop = asyncio.get_running_loop()
+        collapsed = await loop.run_in_executor(None, sample_stacks, seconds, interval)
+    return PlainTextResponse(collapsed)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get('route')
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - start,
+                        method=request.method,
+                        route=getattr(route, 'path', 'unmatched'),
+                        status=status)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -70,6 +490,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_event_buffer():
+    event_buffer.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await event_buffer.stop()
     client.close()
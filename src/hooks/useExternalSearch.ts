@@ -21,15 +21,15 @@ export const useExternalSearch = () => {
       // Track analytics for external search
       analytics.trackTalentSearch(query, results.length);
       
-      // Track each external candidate analyzed
-      results.forEach((candidate) => {
-        analytics.trackCandidateAnalyzed({
+      // Track external candidates analyzed as a single batch
+      analytics.trackCandidatesAnalyzed(
+        results.map((candidate) => ({
           score: candidate.score,
           skills: candidate.skills || [],
-          mode: 'external',
+          mode: 'external' as const,
           redFlags: 0 // External candidates don't have red flags analysis
-        });
-      });
+        }))
+      );
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Search failed');
       console.error('External search error:', err);
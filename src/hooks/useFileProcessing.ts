@@ -159,15 +159,15 @@ export const useFileProcessing = () => {
 
       setCandidates(processedCandidates);
       
-      // Track analytics for each processed candidate
-      processedCandidates.forEach((candidate) => {
-        analytics.trackCandidateAnalyzed({
+      // Track analytics for processed candidates as a single batch
+      analytics.trackCandidatesAnalyzed(
+        processedCandidates.map((candidate) => ({
           score: candidate.score,
           skills: candidate.skills || [],
-          mode: 'internal',
+          mode: 'internal' as const,
           redFlags: candidate.redFlags?.length || 0
-        });
-      });
+        }))
+      );
       
       console.log("Processed candidates:", processedCandidates);
     } catch (err) {
@@ -1,12 +1,41 @@
 import posthog from "posthog-js";
 
+type CandidateAnalyzedData = {
+  score: number;
+  skills: string[];
+  mode: "internal" | "external";
+  redFlags: number;
+};
+
+type QueuedEvent = {
+  event: string;
+  properties: Record<string, any>;
+  timestamp: string;
+};
+
+const EVENT_BATCH_SIZE = 200;
+const EVENT_FLUSH_INTERVAL_MS = 2000;
+const MAX_QUEUED_EVENTS = 10000;
+// Browsers cap the combined size of in-flight keepalive/beacon bodies at 64 KB
+const UNLOAD_PAYLOAD_LIMIT_BYTES = 60 * 1024;
+
 class AnalyticsService {
   private initialized = false;
   private isBlocked = false;
+  private eventsEndpoint: string | null = null;
+  private eventQueue: QueuedEvent[] = [];
+  private flushTimer: ReturnType<typeof setTimeout> | null = null;
+  private flushing: Promise<void> | null = null;
 
   init() {
     if (this.initialized) return;
 
+    const backendUrl = import.meta.env.VITE_BACKEND_URL;
+    if (backendUrl && !this.eventsEndpoint) {
+      this.eventsEndpoint = `${backendUrl.replace(/\/$/, "")}/api/events`;
+      window.addEventListener("pagehide", () => this.flushEventsOnUnload());
+    }
+
     const posthogKey = import.meta.env.VITE_POSTHOG_KEY;
     const posthogHost =
       import.meta.env.VITE_POSTHOG_HOST || "https://us.i.posthog.com";
@@ -70,23 +99,206 @@ class AnalyticsService {
     }
   }
 
-  // Track candidate analysis events
-  trackCandidateAnalyzed(candidateData: {
-    score: number;
-    skills: string[];
-    mode: "internal" | "external";
-    redFlags: number;
-  }) {
-    this.safeCapture("candidate_analyzed", {
+  // Queue an event for batched ingestion by the backend /api/events endpoint
+  private enqueueEvent(event: string, properties: Record<string, any>) {
+    if (!this.eventsEndpoint) return;
+
+    this.eventQueue.push({
+      event,
+      properties,
+      timestamp: new Date().toISOString(),
+    });
+
+    if (this.eventQueue.length >= EVENT_BATCH_SIZE) {
+      this.flushEvents();
+    } else {
+      this.scheduleFlush();
+    }
+  }
+
+  private scheduleFlush() {
+    if (this.flushTimer) return;
+    this.flushTimer = setTimeout(
+      () => this.flushEvents(),
+      EVENT_FLUSH_INTERVAL_MS
+    );
+  }
+
+  // Send queued events one batch at a time; concurrent calls share the same flush
+  flushEvents(): Promise<void> {
+    if (this.flushTimer) {
+      clearTimeout(this.flushTimer);
+      this.flushTimer = null;
+    }
+    if (!this.eventsEndpoint) return Promise.resolve();
+
+    if (!this.flushing) {
+      this.flushing = this.sendQueuedEvents().finally(() => {
+        this.flushing = null;
+      });
+    }
+    return this.flushing;
+  }
+
+  private async sendQueuedEvents() {
+    while (this.eventQueue.length > 0 && this.eventsEndpoint) {
+      const events = this.eventQueue.splice(0, EVENT_BATCH_SIZE);
+
+      let retry = false;
+      try {
+        const response = await fetch(this.eventsEndpoint, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ events }),
+        });
+        if (!response.ok) {
+          console.warn(
+            `Failed to send analytics events: HTTP ${response.status}`
+          );
+          // Client errors won't succeed on retry, server errors might
+          retry = response.status >= 500;
+        }
+      } catch (error) {
+        console.warn("Failed to send analytics events:", error);
+        retry = true;
+      }
+
+      if (retry) {
+        this.requeueEvents(events);
+        this.scheduleFlush();
+        return;
+      }
+    }
+  }
+
+  private requeueEvents(events: QueuedEvent[]) {
+    this.eventQueue.unshift(...events);
+    const overflow = this.eventQueue.length - MAX_QUEUED_EVENTS;
+    if (overflow > 0) {
+      this.eventQueue.splice(0, overflow);
+      console.warn(`Dropped ${overflow} queued analytics events`);
+    }
+  }
+
+  // Final flush on pagehide: a single payload kept under the 64 KB keepalive quota,
+  // sent as text/plain because sendBeacon only allows CORS-safelisted content types
+  private flushEventsOnUnload() {
+    if (this.flushTimer) {
+      clearTimeout(this.flushTimer);
+      this.flushTimer = null;
+    }
+    if (!this.eventsEndpoint || this.eventQueue.length === 0) return;
+
+    const encoder = new TextEncoder();
+    const serialized: string[] = [];
+    let size = encoder.encode('{"events":[]}').length;
+
+    for (const event of this.eventQueue) {
+      const json = JSON.stringify(event);
+      const eventBytes = encoder.encode(json).length + 1; // trailing comma
+      if (size + eventBytes > UNLOAD_PAYLOAD_LIMIT_BYTES) break;
+      serialized.push(json);
+      size += eventBytes;
+    }
+    if (serialized.length === 0) return;
+
+    const body = `{"events":[${serialized.join(",")}]}`;
+    const events = this.eventQueue.slice(0, serialized.length);
+
+    let sent = false;
+    if (navigator.sendBeacon) {
+      try {
+        sent = navigator.sendBeacon(
+          this.eventsEndpoint,
+          new Blob([body], { type: "text/plain" })
+        );
+      } catch (error) {
+        console.warn("Failed to send analytics beacon:", error);
+      }
+    }
+    if (!sent) {
+      try {
+        fetch(this.eventsEndpoint, {
+          method: "POST",
+          headers: { "Content-Type": "text/plain" },
+          body,
+          keepalive: true,
+        }).catch((error) => {
+          // Only matters if the page survives, e.g. when restored from the bfcache
+          console.warn("Failed to send analytics events:", error);
+          this.requeueEvents(events);
+        });
+        sent = true;
+      } catch (error) {
+        console.warn("Failed to send analytics events:", error);
+      }
+    }
+
+    // Unsent events stay queued in case the page is restored from the bfcache
+    if (sent) {
+      this.eventQueue.splice(0, serialized.length);
+    }
+  }
+
+  private candidateAnalyzedProperties(candidateData: CandidateAnalyzedData) {
+    return {
       score: candidateData.score,
       skills_count: candidateData.skills.length,
       top_skills: candidateData.skills.slice(0, 5),
       mode: candidateData.mode,
       red_flags_count: candidateData.redFlags,
       score_category: this.getScoreCategory(candidateData.score),
+    };
+  }
+
+  // Track a whole batch of analyzed candidates: per-candidate events go to the
+  // backend in batches, PostHog only receives a single summary event
+  trackCandidatesAnalyzed(candidates: CandidateAnalyzedData[]) {
+    if (candidates.length === 0) return;
+
+    const scoreCategories: Record<string, number> = {};
+    let redFlagsCount = 0;
+
+    candidates.forEach((candidate) => {
+      const properties = this.candidateAnalyzedProperties(candidate);
+      scoreCategories[properties.score_category] =
+        (scoreCategories[properties.score_category] || 0) + 1;
+      redFlagsCount += candidate.redFlags;
+      this.enqueueEvent("candidate_analyzed", properties);
+    });
+
+    this.safeCapture("candidates_batch_analyzed", {
+      candidates_count: candidates.length,
+      mode: candidates[0].mode,
+      red_flags_count: redFlagsCount,
+      score_categories: scoreCategories,
     });
   }
 
+  // Time a Gemini or GitHub call; the timing is sent through /api/events and
+  // exposed by the backend's /api/metrics
+  async timeOutboundCall<T>(
+    service: "gemini" | "github",
+    call: () => Promise<T>
+  ): Promise<T> {
+    const start = performance.now();
+    let status = "ok";
+    try {
+      const result = await call();
+      if (result instanceof Response && !result.ok) status = "error";
+      return result;
+    } catch (error) {
+      status = "error";
+      throw error;
+    } finally {
+      this.enqueueEvent("outbound_call", {
+        service,
+        status,
+        duration_ms: Math.round(performance.now() - start),
+      });
+    }
+  }
+
   // Track resume uploads
   trackResumeUploaded(fileType: string, fileSize: number) {
     this.safeCapture("resume_uploaded", {
@@ -1,3 +1,5 @@
+import { analytics } from '@/lib/analytics';
+
 export interface GitHubUser {
   id: number;
   login: string;
@@ -72,7 +74,9 @@ class GitHubApiService {
         searchQuery += ` language:${language}`;
       }
       
-      const response = await fetch(`${this.baseUrl}/search/users?q=${encodeURIComponent(searchQuery)}&per_page=20`);
+      const response = await analytics.timeOutboundCall('github', () =>
+        fetch(`${this.baseUrl}/search/users?q=${encodeURIComponent(searchQuery)}&per_page=20`)
+      );
       const data = await response.json();
       
       if (!response.ok) {
@@ -99,8 +103,10 @@ class GitHubApiService {
   async getUserDetails(username: string): Promise<ExternalCandidate | null> {
     try {
       const [userResponse, reposResponse] = await Promise.all([
-        fetch(`${this.baseUrl}/users/${username}`),
-        fetch(`${this.baseUrl}/users/${username}/repos?sort=updated&per_page=10`)
+        analytics.timeOutboundCall('github', () => fetch(`${this.baseUrl}/users/${username}`)),
+        analytics.timeOutboundCall('github', () =>
+          fetch(`${this.baseUrl}/users/${username}/repos?sort=updated&per_page=10`)
+        )
       ]);
       
       const user = await userResponse.json();
@@ -1,4 +1,5 @@
 import { GoogleGenerativeAI } from "@google/generative-ai";
+import { analytics } from "@/lib/analytics";
 
 declare global {
   interface Window {
@@ -165,15 +166,17 @@ A summary of the reasoning behind your credibility score.
 
     // Generate content with Gemini
     const model = ai.getGenerativeModel({ model: "gemini-2.0-flash-exp" });
-    const response = await model.generateContent([
-      prompt,
-      {
-        inlineData: {
-          mimeType: file.type,
-          data: base64,
+    const response = await analytics.timeOutboundCall("gemini", () =>
+      model.generateContent([
+        prompt,
+        {
+          inlineData: {
+            mimeType: file.type,
+            data: base64,
+          },
         },
-      },
-    ]);
+      ])
+    );
 
     // Parse the response, handling markdown formatting
     const responseText = response.response.text();
@@ -263,7 +266,9 @@ Return ONLY a valid JSON array with this exact format:
 Make questions specific to their background, not generic. Use their actual skills and experience in the questions.`;
 
     const model = ai.getGenerativeModel({ model: "gemini-2.0-flash-exp" });
-    const response = await model.generateContent(prompt);
+    const response = await analytics.timeOutboundCall("gemini", () =>
+      model.generateContent(prompt)
+    );
     
     const responseText = response.response.text();
     let jsonStr = responseText;
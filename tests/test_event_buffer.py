@@ -0,0 +1,305 @@
+import asyncio
+from datetime import datetime
+
+import bson
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from backend import server
+
+
+class StubCollection:
+    def __init__(self):
+        self.inserted = []
+        self.bulk_writes = []
+        self.fail_with = None
+        self.release = None
+
+    async def insert_many(self, documents, ordered=True):
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail_with is not None:
+            raise self.fail_with
+        # Encode like pymongo would, so un-encodable documents fail here too
+        for document in documents:
+            bson.encode(document)
+        self.inserted.extend(documents)
+
+    async def insert_one(self, document):
+        bson.encode(document)
+        self.inserted.append(document)
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.bulk_writes.append(requests)
+
+
+class StubDb:
+    def __init__(self):
+        self.analytics_events = StubCollection()
+        self.analytics_counters = StubCollection()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    stub = StubDb()
+    monkeypatch.setattr(server, 'db', stub)
+    return stub
+
+
+def make_event(name='candidate_analyzed', day=15, **properties):
+    return server.AnalyticsEvent(event=name, properties=properties, timestamp=datetime(2026, 10, day, 12))
+
+
+def counters_by_day(db):
+    return {
+        request._filter['_id']: request._doc['$inc']
+        for requests in db.analytics_counters.bulk_writes
+        for request in requests
+    }
+
+
+def test_count_aggregates_candidate_events(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([
+        make_event(mode='internal', score_category='high', red_flags_count=2),
+        make_event(mode='internal', score_category='low', red_flags_count=0),
+        make_event(mode='external', score_category='high'),
+        make_event('resume_uploaded'),
+    ]))
+    asyncio.run(buffer.flush())
+
+    assert len(db.analytics_events.inserted) == 4
+    assert counters_by_day(db) == {
+        '2026-10-15': {
+            'events.candidate_analyzed': 3,
+            'events.resume_uploaded': 1,
+            'candidates_analyzed': 3,
+            'candidates_by_mode.internal': 2,
+            'candidates_by_mode.external': 1,
+            'score_distribution.high': 2,
+            'score_distribution.low': 1,
+            'red_flags_total': 2,
+            'candidates_with_red_flags': 1,
+        }
+    }
+
+
+def test_count_ignores_unknown_client_values(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([
+        make_event('a.'),
+        make_event('a..b'),
+        make_event('$set'),
+        make_event(mode='in.ternal', score_category='$high', red_flags_count=True),
+    ]))
+    asyncio.run(buffer.flush())
+
+    assert counters_by_day(db) == {
+        '2026-10-15': {
+            'events.other': 3,
+            'events.candidate_analyzed': 1,
+            'candidates_analyzed': 1,
+        }
+    }
+
+
+def test_counters_are_split_per_day_in_one_bulk_write(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event(day=14), make_event(day=15)]))
+    asyncio.run(buffer.flush())
+
+    assert len(db.analytics_counters.bulk_writes) == 1
+    assert set(counters_by_day(db)) == {'2026-10-14', '2026-10-15'}
+
+
+def test_add_flushes_in_the_background_when_buffer_is_full(db):
+    async def run():
+        buffer = server.EventBuffer(max_size=2)
+        await buffer.add([make_event()])
+        assert buffer._flush_tasks == set()
+
+        db.analytics_events.release = asyncio.Event()
+        await buffer.add([make_event()])
+        # add() returned while the insert is still waiting on Mongo
+        assert db.analytics_events.inserted == []
+
+        db.analytics_events.release.set()
+        await asyncio.gather(*buffer._flush_tasks)
+
+    asyncio.run(run())
+    assert len(db.analytics_events.inserted) == 2
+
+
+def test_add_rejects_unencodable_and_oversized_events(db):
+    buffer = server.EventBuffer(max_size=100)
+    accepted = asyncio.run(buffer.add([
+        make_event(n=10 ** 30),
+        make_event(blob='x' * (server.MAX_EVENT_BYTES + 1)),
+        make_event(mode='internal'),
+    ]))
+    asyncio.run(buffer.flush())
+
+    assert accepted == 1
+    assert len(db.analytics_events.inserted) == 1
+    assert counters_by_day(db)['2026-10-15']['candidates_analyzed'] == 1
+
+
+def test_add_enforces_buffer_limit(db):
+    buffer = server.EventBuffer(max_size=100, max_buffered=3)
+    asyncio.run(buffer.add([make_event() for _ in range(5)]))
+
+    assert len(buffer._events) == 3
+
+
+def test_failed_insert_requeues_events_and_counters(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event(mode='internal')]))
+
+    db.analytics_events.fail_with = AutoReconnect('mongo down')
+    asyncio.run(buffer.flush())
+    assert db.analytics_counters.bulk_writes == []
+
+    db.analytics_events.fail_with = None
+    asyncio.run(buffer.flush())
+    assert len(db.analytics_events.inserted) == 1
+    assert counters_by_day(db)['2026-10-15']['candidates_by_mode.internal'] == 1
+
+
+def test_duplicate_key_errors_on_retry_count_as_stored(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event()]))
+
+    db.analytics_events.fail_with = BulkWriteError({
+        'writeErrors': [{'index': 0, 'code': server.DUPLICATE_KEY_ERROR}],
+        'writeConcernErrors': [],
+    })
+    asyncio.run(buffer.flush())
+
+    assert counters_by_day(db)['2026-10-15']['candidates_analyzed'] == 1
+    assert buffer._events == []
+
+
+def test_failed_counter_days_are_requeued_only_when_retryable(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event(day=14), make_event(day=15)]))
+
+    # Days are written in insertion order: index 0 is 2026-10-14, index 1 is 2026-10-15
+    db.analytics_counters.fail_with = BulkWriteError({
+        'writeErrors': [
+            {'index': 0, 'code': 2, 'errmsg': 'bad update'},
+            {'index': 1, 'code': server.DUPLICATE_KEY_ERROR},
+        ],
+        'writeConcernErrors': [],
+    })
+    asyncio.run(buffer.flush())
+
+    # Only the day that raced on upsert is retried; the rejected day is dropped
+    assert set(day for day, _ in buffer._counters) == {'2026-10-15'}
+    assert buffer._events == []
+
+
+def test_requeue_is_bounded(db):
+    buffer = server.EventBuffer(max_size=100, max_buffered=3)
+    asyncio.run(buffer.add([make_event() for _ in range(2)]))
+
+    db.analytics_events.fail_with = AutoReconnect('mongo down')
+    asyncio.run(buffer.flush())
+    asyncio.run(buffer.add([make_event() for _ in range(2)]))
+
+    assert len(buffer._events) == 3
+
+
+def test_poison_event_does_not_block_later_flushes(db):
+    buffer = server.EventBuffer(max_size=1000)
+    asyncio.run(buffer.add([make_event() for _ in range(3)]))
+    # Bypass the ingest check, as if a document slipped past it
+    buffer._events[1]['properties'] = {'n': 10 ** 30}
+
+    asyncio.run(buffer.flush())
+    assert buffer._events == []
+    assert len(db.analytics_events.inserted) == 2
+    assert counters_by_day(db)['2026-10-15']['candidates_analyzed'] == 3
+
+    asyncio.run(buffer.add([make_event()]))
+    asyncio.run(buffer.flush())
+    assert len(db.analytics_events.inserted) == 3
+    assert len(db.analytics_counters.bulk_writes) == 2
+
+
+def test_documents_rejected_by_mongo_are_dropped(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event(), make_event()]))
+
+    db.analytics_events.fail_with = BulkWriteError({
+        'writeErrors': [{'index': 1, 'code': 2, 'errmsg': 'bad document'}],
+        'writeConcernErrors': [],
+    })
+    asyncio.run(buffer.flush())
+
+    assert buffer._events == []
+    assert counters_by_day(db)['2026-10-15']['candidates_analyzed'] == 2
+
+
+def test_write_concern_errors_retry_all_but_rejected_documents(db):
+    buffer = server.EventBuffer(max_size=100)
+    asyncio.run(buffer.add([make_event(day=14), make_event(day=15)]))
+
+    db.analytics_events.fail_with = BulkWriteError({
+        'writeErrors': [{'index': 0, 'code': 2, 'errmsg': 'bad document'}],
+        'writeConcernErrors': [{'code': 64, 'errmsg': 'waiting for replication timed out'}],
+    })
+    asyncio.run(buffer.flush())
+
+    assert [event['timestamp'].day for event in buffer._events] == [15]
+    assert db.analytics_counters.bulk_writes == []
+
+
+def test_stop_flushes_remaining_events(db):
+    async def run():
+        buffer = server.EventBuffer(max_size=100, flush_interval=60)
+        buffer.start()
+        await buffer.add([make_event()])
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert len(db.analytics_events.inserted) == 1
+
+
+@pytest.mark.parametrize('days', [0, -1, 366])
+def test_event_counters_rejects_out_of_range_days(days):
+    from fastapi.testclient import TestClient
+
+    response = TestClient(server.app).get('/api/events/counters', params={'days': days})
+    assert response.status_code == 422
+
+
+def test_ingest_reports_rejected_events(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, 'event_buffer', server.EventBuffer(max_size=100))
+    response = TestClient(server.app).post('/api/events', json={'events': [
+        {'event': 'candidate_analyzed', 'properties': {'n': 10 ** 30}},
+        {'event': 'candidate_analyzed', 'properties': {'mode': 'internal'}},
+    ]})
+
+    assert response.status_code == 202
+    assert response.json() == {'accepted': 1, 'rejected': 1}
+
+
+def test_ingest_accepts_text_plain_beacons(db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, 'event_buffer', server.EventBuffer(max_size=100))
+    client = TestClient(server.app)
+    beacon = client.post(
+        '/api/events',
+        content='{"events": [{"event": "candidate_analyzed", "properties": {}}]}',
+        headers={'Content-Type': 'text/plain'},
+    )
+    invalid = client.post('/api/events', content='{"events": "nope"}', headers={'Content-Type': 'text/plain'})
+
+    assert beacon.status_code == 202
+    assert beacon.json() == {'accepted': 1, 'rejected': 0}
+    assert invalid.status_code == 422
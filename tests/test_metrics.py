@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend import server
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = server.MetricsRegistry(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        registry.observe('latency_seconds', value, route='/api/x')
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/api/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/api/x"} 6.05' in lines
+    assert 'latency_seconds_count{route="/api/x"} 4' in lines
+
+
+def test_render_includes_help_and_type_once_per_metric():
+    registry = server.MetricsRegistry(buckets=(1.0,))
+    registry.describe('latency_seconds', 'Request latency.')
+    registry.observe('latency_seconds', 0.5, route='/a')
+    registry.observe('latency_seconds', 2.0, route='/b')
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == [
+        '# HELP latency_seconds Request latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/a",le="1.0"} 1',
+    ]
+    assert lines.count('# TYPE latency_seconds histogram') == 1
+    assert 'latency_seconds_bucket{route="/b",le="1.0"} 0' in lines
+
+
+def test_label_values_are_escaped():
+    registry = server.MetricsRegistry()
+    registry.observe('latency_seconds', 0.5, route='a"b\\c\nd')
+
+    assert 'latency_seconds_count{route="a\\"b\\\\c\\nd"} 1' in registry.render().splitlines()
+
+
+def test_observe_outbound_calls_ignores_unknown_services_and_bad_durations(monkeypatch):
+    registry = server.MetricsRegistry(buckets=(1.0,))
+    monkeypatch.setattr(server, 'metrics', registry)
+
+    def outbound(**properties):
+        return server.AnalyticsEvent(event='outbound_call', properties=properties, timestamp=datetime(2026, 10, 15))
+
+    server.observe_outbound_calls([
+        outbound(service='gemini', status='ok', duration_ms=250),
+        outbound(service='github', status='error', duration_ms=1500),
+        outbound(service='evil"service', status='ok', duration_ms=10),
+        outbound(service='gemini', status='ok', duration_ms=-5),
+        outbound(service='gemini', status='ok', duration_ms=True),
+        outbound(service='gemini', status='ok', duration_ms='fast'),
+    ])
+
+    lines = registry.render().splitlines()
+    assert 'outbound_request_duration_seconds_count{service="gemini",status="ok"} 1' in lines
+    assert 'outbound_request_duration_seconds_bucket{service="github",status="error",le="1.0"} 0' in lines
+    assert not any('evil' in line for line in lines)
+
+
+def test_metrics_endpoint_reports_route_latency(monkeypatch):
+    registry = server.MetricsRegistry()
+    monkeypatch.setattr(server, 'metrics', registry)
+    client = TestClient(server.app)
+
+    client.get('/api/')
+    response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/",status="200"} 1' in response.text
+
+
+@pytest.mark.parametrize('seconds, interval', [(0, 0.01), (61, 0.01), (1, 1e-9), (1, 2)])
+def test_profile_rejects_out_of_range_arguments(monkeypatch, seconds, interval):
+    monkeypatch.setattr(server, 'ENABLE_PROFILER', True)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.profile(seconds=seconds, interval=interval))
+    assert excinfo.value.status_code == 400
+
+
+def test_profile_is_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(server, 'ENABLE_PROFILER', False)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.profile(seconds=1, interval=0.01))
+    assert excinfo.value.status_code == 404
+
+
+def test_profile_allows_one_run_at_a_time(monkeypatch):
+    monkeypatch.setattr(server, 'ENABLE_PROFILER', True)
+
+    async def run():
+        async with server.profiler_lock:
+            await server.profile(seconds=1, interval=0.01)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(run())
+    assert excinfo.value.status_code == 409
+
+
+def test_sample_stacks_returns_collapsed_stacks():
+    collapsed = server.sample_stacks(0.02, 0.005)
+
+    for line in collapsed.strip().splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert ';' in stack or '(' in stack
+        assert int(count) > 0
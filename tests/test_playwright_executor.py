@@ -0,0 +1,197 @@
+import asyncio
+import base64
+import importlib.util
+import itertools
+from pathlib import Path
+
+import pytest
+
+EXECUTOR_PATH = Path(__file__).resolve().parent.parent / '.devcontainer' / 'playwright_executor.py'
+spec = importlib.util.spec_from_file_location('playwright_executor', EXECUTOR_PATH)
+executor = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(executor)
+
+
+class FakeBrowser:
+    def __init__(self, connected=True):
+        self.connected = connected
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self, fail_on=()):
+        self.launched = []
+        self.fail_on = set(fail_on)
+
+    async def launch(self, headless=True):
+        if len(self.launched) in self.fail_on:
+            self.launched.append(None)
+            raise RuntimeError('launch failed')
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self, chromium):
+        self.chromium = chromium
+        self.stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture(autouse=True)
+def empty_script_cache():
+    executor._compiled_scripts.clear()
+    yield
+    executor._compiled_scripts.clear()
+
+
+def test_compile_script_caches_by_source():
+    first = executor.compile_script('return 1')
+    second = executor.compile_script('return 1')
+
+    assert first is second
+    assert len(executor._compiled_scripts) == 1
+
+
+def test_compile_script_decodes_base64_to_the_same_entry():
+    plain = executor.compile_script('return 1')
+    encoded = executor.compile_script('base64:' + base64.b64encode(b'return 1').decode())
+
+    assert encoded is plain
+
+
+def test_compile_script_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(executor, '_COMPILED_SCRIPTS_MAX', 2)
+    executor.compile_script('return 1')
+    executor.compile_script('return 2')
+    executor.compile_script('return 1')
+    executor.compile_script('return 3')
+
+    cached_sources = [test_script for test_script, _ in executor._compiled_scripts.values()]
+    assert len(cached_sources) == 2
+    assert not any('return 2' in source for source in cached_sources)
+
+
+def test_compile_script_raises_on_syntax_error():
+    with pytest.raises(SyntaxError):
+        executor.compile_script('return (')
+
+
+def test_load_run_test_gives_each_job_fresh_globals():
+    _, code = executor.compile_script(
+        'global runs\n'
+        'runs = globals().get("runs", 0) + 1\n'
+        'return runs'
+    )
+
+    results = [asyncio.run(executor.load_run_test(code)(None, '.')) for _ in range(2)]
+    assert results == [1, 1]
+
+
+@pytest.mark.parametrize('job, message', [
+    ('not a job', 'expected a JSON object'),
+    ({'script': 'return 1'}, 'missing url'),
+    ({'url': 'http://localhost', 'script': ''}, 'missing script'),
+    ({}, 'missing url, script'),
+])
+def test_job_error_describes_invalid_jobs(job, message):
+    assert message in executor._job_error(job)
+
+
+def test_job_error_accepts_valid_jobs():
+    assert executor._job_error({'url': 'http://localhost', 'script': 'return 1'}) is None
+
+
+class FakePool:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+
+    async def run(self, *args):
+        self.calls.append(args)
+        if self.error is not None:
+            raise self.error
+        return dict(self.result)
+
+
+def run_job(pool, job):
+    return asyncio.run(executor._run_job(pool, job, '.screenshots', False, 'networkidle'))
+
+
+def test_run_job_rejects_invalid_jobs_without_running_them():
+    pool = FakePool()
+    result = run_job(pool, {'id': 7, 'url': 'http://localhost'})
+
+    assert pool.calls == []
+    assert result['status'] == 'error'
+    assert result['id'] == 7
+
+
+def test_run_job_echoes_id():
+    pool = FakePool(result={'status': 'success', 'data': {}})
+    result = run_job(pool, {'id': 'a', 'url': 'http://localhost', 'script': 'return 1', 'wait_until': 'load'})
+
+    assert result == {'status': 'success', 'data': {}, 'id': 'a'}
+    assert pool.calls == [('http://localhost', 'return 1', '.screenshots', False, 'load')]
+
+
+def test_run_job_turns_exceptions_into_error_results():
+    pool = FakePool(error=RuntimeError('boom'))
+    result = run_job(pool, {'id': 3, 'url': 'http://localhost', 'script': 'return 1'})
+
+    assert result['status'] == 'error'
+    assert result['data']['error'] == 'Setup error: boom'
+    assert result['id'] == 3
+
+
+def test_pool_run_fails_fast_on_syntax_errors():
+    # Not started: taking a slot or a browser would raise, so an error result proves neither happened
+    pool = executor.BrowserPool(size=1, concurrency=1)
+    result = asyncio.run(pool.run('http://localhost', 'return ('))
+
+    assert result['status'] == 'error'
+    assert result['data']['error'].startswith('Script error:')
+
+
+def test_acquire_browser_relaunches_disconnected_browsers():
+    chromium = FakeChromium()
+    pool = executor.BrowserPool(size=2)
+    pool._playwright = FakePlaywright(chromium)
+    crashed, healthy = FakeBrowser(connected=False), FakeBrowser()
+    pool._browsers = [crashed, healthy]
+    pool._next_index = itertools.cycle(range(2))
+
+    first = asyncio.run(pool._acquire_browser())
+    second = asyncio.run(pool._acquire_browser())
+
+    assert first is chromium.launched[0]
+    assert pool._browsers == [first, healthy]
+    assert second is healthy
+
+
+def test_start_closes_launched_browsers_when_a_launch_fails(monkeypatch):
+    playwright = FakePlaywright(FakeChromium(fail_on={1}))
+
+    class FakeStarter:
+        async def start(self):
+            return playwright
+
+    monkeypatch.setattr(executor, 'async_playwright', FakeStarter)
+    pool = executor.BrowserPool(size=2)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.start())
+
+    assert playwright.chromium.launched[0].closed
+    assert playwright.stopped
+    assert pool._browsers == []